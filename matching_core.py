@@ -0,0 +1,294 @@
+from datetime import date, datetime
+import csv
+from bisect import bisect_right
+from collections import defaultdict, deque
+from operator import attrgetter, itemgetter
+
+class Trade:
+    __slots__ = ('date', 'order_type', 'ticker', 'total_amount', 'qty',
+                 'price', 'original_qty', 'matched_qty', 'idx', 'ticker_id')
+
+    def __init__(self, date, order_type, ticker, total_amount, qty, idx, ticker_id):
+        self.date = date
+        self.order_type = order_type
+        self.ticker = ticker
+        self.total_amount = total_amount
+        self.qty = qty
+        # protect division by zero just in case
+        self.price = (total_amount / qty) if qty != 0 else 0.0
+        self.original_qty = qty
+        self.matched_qty = 0
+        # position in the loaded order list, used to flag trades by index
+        self.idx = idx
+        # dense integer id for the ticker, so matching compares ints not strings
+        self.ticker_id = ticker_id
+
+class Match:
+    __slots__ = ('buy', 'sell', 'qty', 'profit', 'holding_period_days', 'is_wash_sale',
+                 'is_short_term', 'is_long_term')
+
+    def __init__(self, buy, sell, qty):
+        self.buy = buy
+        self.sell = sell
+        self.qty = qty
+        self.profit = (sell.price - buy.price) * qty
+        # one date subtraction feeds both the holding period and the wash-sale test
+        days = (sell.date - buy.date).days
+        self.holding_period_days = abs(days)
+        self.is_wash_sale = 0 < days <= 30 and sell.price < buy.price
+        self.is_short_term = self.holding_period_days <= 365
+        self.is_long_term = not self.is_short_term
+
+# Objective functions
+def objective_profit(matches): return sum(m.profit for m in matches)
+def objective_loss(matches): return -sum(m.profit for m in matches)
+def objective_short_term_profit(matches): return sum(m.profit for m in matches if m.is_short_term)
+def objective_long_term_profit(matches): return sum(m.profit for m in matches if m.is_long_term)
+def objective_short_term_loss(matches): return -sum(m.profit for m in matches if m.is_short_term)
+def objective_long_term_loss(matches): return -sum(m.profit for m in matches if m.is_long_term)
+def objective_minimal_loss(matches): return abs(min(0, sum(m.profit for m in matches)))
+
+# Per-match sort keys: equivalent to -objective([m]) without building a list
+def sort_key_profit(m): return -m.profit
+def sort_key_loss(m): return m.profit
+def sort_key_short_term_profit(m): return -m.profit if m.is_short_term else 0
+def sort_key_long_term_profit(m): return -m.profit if m.is_long_term else 0
+def sort_key_short_term_loss(m): return m.profit if m.is_short_term else 0
+def sort_key_long_term_loss(m): return m.profit if m.is_long_term else 0
+def sort_key_minimal_loss(m): return min(0, m.profit)
+
+strategy_map = {
+    "1": ("最大化利润", objective_profit, sort_key_profit),
+    "2": ("最大化亏损", objective_loss, sort_key_loss),
+    "3": ("最大化短期利润", objective_short_term_profit, sort_key_short_term_profit),
+    "4": ("最大化长期利润", objective_long_term_profit, sort_key_long_term_profit),
+    "5": ("最大化短期亏损", objective_short_term_loss, sort_key_short_term_loss),
+    "6": ("最大化长期亏损", objective_long_term_loss, sort_key_long_term_loss),
+    "7": ("最小化亏损（靠近0）", objective_minimal_loss, sort_key_minimal_loss)
+}
+
+def apply_wash_sale(records):
+    # records must be date-sorted (see load_orders_from_stream)
+    # per ticker, the buys still eligible for an adjustment, oldest first
+    ticker_buys = defaultdict(deque)
+    wash_sales = []
+
+    # walk chronologically so buys that fall out of the 30-day window of
+    # one sell are out of it for every later sell too
+    for record in records:
+        date = record['date']
+        type_ = record['type']
+        ticker = record['ticker']
+        ticker_id = record['ticker_id']
+        total = record['total_amount']
+        qty = record['qty']
+        price = total / qty if qty != 0 else 0.0
+
+        if type_ == 'buy':
+            buy = {
+                'date': date,
+                'ticker': ticker,
+                'qty': qty,
+                'price': price,
+                'orig_total': total
+            }
+            ticker_buys[ticker_id].append(buy)
+
+        elif type_ == 'sell':
+            pending = ticker_buys[ticker_id]
+            while pending and (date - pending[0]['date']).days > 30:
+                pending.popleft()
+            for i, buy in enumerate(pending):
+                # what is left is within the window; stop at same-day buys
+                if (date - buy['date']).days <= 0:
+                    break
+                loss_per_unit = buy['price'] - price
+                if loss_per_unit > 0:
+                    adjustment = loss_per_unit
+                    old_price = buy['price']
+                    buy['price'] += adjustment
+                    buy['orig_total'] += adjustment * buy['qty']
+                    del pending[i]
+                    wash_sales.append({
+                        'ticker': ticker,
+                        'sell_date': date,
+                        'buy_date': buy['date'],
+                        'adjustment_per_unit': adjustment,
+                        'qty': buy['qty'],
+                        'total_adjustment': adjustment * buy['qty'],
+                        'old_price': old_price,
+                        'new_price': buy['price']
+                    })
+                    break
+
+    return wash_sales
+
+def parse_date(text):
+    """
+    text: date string in "%Y-%m-%d" form
+    returns: datetime.date
+    """
+    # fast path for zero-padded YYYY-MM-DD; anything else (e.g. 2022-1-5)
+    # goes through strptime so accepted and rejected inputs stay the same
+    if len(text) == 10 and text[4] == text[7] == '-':
+        try:
+            return date.fromisoformat(text)
+        except ValueError:
+            pass
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+def read_records(stream):
+    """
+    stream: text-mode file-like object with a header row
+    returns: list of record dicts, one per CSV row
+    """
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return []
+    # resolve column positions once instead of building a dict per row
+    i_date, i_type, i_ticker, i_total, i_qty = (
+        header.index(col) for col in ('date', 'type', 'ticker', 'total amount', 'qty')
+    )
+
+    ticker_to_id = {}
+    records = []
+    for row in reader:
+        if not row:
+            continue
+        ticker = row[i_ticker]
+        records.append({
+            'date': parse_date(row[i_date]),
+            'type': row[i_type],
+            'ticker': ticker,
+            'ticker_id': ticker_to_id.setdefault(ticker, len(ticker_to_id)),
+            'total_amount': float(row[i_total]),
+            'qty': int(row[i_qty])
+        })
+    return records
+
+def load_orders_from_stream(stream):
+    """
+    stream: text-mode file-like object (e.g. io.StringIO)
+    returns: date-sorted list of Trade objects (with wash-sale adjustments applied)
+    """
+    records = read_records(stream)
+    # sort once here; the wash-sale pass and matching rely on date order
+    # (stable, so same-day orders keep their file order). Files that are not
+    # chronological, e.g. newest-first broker exports, get the adjustments of
+    # the same orders in date order, not the ones their row order used to give
+    records.sort(key=itemgetter('date'))
+    wash_sales = apply_wash_sale(records)
+    # later adjustments for the same lot date win, as with a sequential scan
+    ws_index = {(ws['ticker'], ws['buy_date']): ws for ws in wash_sales}
+    orders = []
+
+    for i, r in enumerate(records):
+        trade = Trade(r['date'], r['type'], r['ticker'], r['total_amount'], r['qty'], i, r['ticker_id'])
+        if trade.order_type == "buy":
+            ws = ws_index.get((trade.ticker, trade.date))
+            if ws:
+                trade.price = ws['new_price']
+                trade.total_amount = trade.price * trade.qty
+        orders.append(trade)
+
+    return orders
+
+def load_orders(filename):
+    with open(filename, mode='r', encoding='utf-8', newline='') as file:
+        return load_orders_from_stream(file)
+
+def _candidate_matches(buys, sells):
+    """
+    buys, sells: date-sorted lists of Trade objects
+    returns: a Match for every same-ticker (buy, sell) pair with open qty
+             and the buy dated on or before the sell, in sell-date order
+    """
+    # bucket buys by ticker; each bucket stays date-ordered and keeps its
+    # dates in a parallel list so the sweep never touches Trade attributes
+    ticker_buys = defaultdict(list)
+    ticker_buy_dates = defaultdict(list)
+    for buy in buys:
+        ticker_buys[buy.ticker_id].append(buy)
+        ticker_buy_dates[buy.ticker_id].append(buy.date)
+
+    # per-ticker pointer: ticker_buys[t][:reachable[t]] are the buys dated
+    # on or before the current sell; it only moves forward as sells advance
+    reachable = defaultdict(int)
+    all_matches = []
+    append = all_matches.append
+    for sell in sells:
+        sell_qty = sell.qty
+        if sell_qty <= 0:
+            continue
+        ticker = sell.ticker_id
+        bucket = ticker_buys.get(ticker)
+        if not bucket:
+            continue
+        i = bisect_right(ticker_buy_dates[ticker], sell.date, reachable[ticker])
+        reachable[ticker] = i
+        # index into the prefix rather than slicing a copy of it per sell
+        for j in range(i):
+            buy = bucket[j]
+            buy_qty = buy.qty
+            if buy_qty > 0:
+                append(Match(buy, sell, min(sell_qty, buy_qty)))
+
+    return all_matches
+
+def generate_matches(orders, sort_key):
+    """
+    orders: list of Trade objects
+    sort_key: per-match key from strategy_map; lower sorts first
+    returns: list of selected Match objects
+    """
+    # the candidate sweep needs date order. Loaders already return orders
+    # sorted, so this stable sort is a single linear pass for them and only
+    # does real work for callers passing unsorted lists
+    orders = sorted(orders, key=attrgetter('date'))
+    buys = [o for o in orders if o.order_type == "buy"]
+    sells = [o for o in orders if o.order_type == "sell"]
+
+    all_matches = _candidate_matches(buys, sells)
+
+    result = []
+    # flags are indexed by Trade.idx (load position), so size them for the
+    # highest index present; orders may be any subset of the loaded list
+    n_flags = max((o.idx for o in orders), default=-1) + 1
+    used_buy = bytearray(n_flags)
+    used_sell = bytearray(n_flags)
+
+    # sort by strategy evaluation on single-match basis (best first)
+    all_matches.sort(key=sort_key)
+    for m in all_matches:
+        if used_buy[m.buy.idx] or used_sell[m.sell.idx]:
+            continue
+        # reuse the candidate; dates and wash-sale status do not depend on qty
+        qty = min(m.buy.qty, m.sell.qty)
+        if qty != m.qty:
+            m.qty = qty
+            m.profit = (m.sell.price - m.buy.price) * qty
+        result.append(m)
+        m.buy.qty -= qty
+        m.sell.qty -= qty
+        used_buy[m.buy.idx] = 1
+        used_sell[m.sell.idx] = 1
+
+    return result
+
+def print_match_summary(matches):
+    print("\n当前匹配记录：")
+    short_term_profit = 0
+    long_term_profit = 0
+    for i, m in enumerate(matches):
+        term = "短期" if m.is_short_term else "长期"
+        wash_flag = "（洗售）" if m.is_wash_sale else ""
+        print(f"{i + 1}: 股票: {m.sell.ticker}, 卖出: {m.sell.date}, 买入: {m.buy.date}, {term}{wash_flag}, 数量: {m.qty}, 收益: {m.profit:.2f}")
+        if m.is_short_term:
+            short_term_profit += m.profit
+        else:
+            long_term_profit += m.profit
+    total_profit = short_term_profit + long_term_profit
+    print(f"\n短期总利润: {short_term_profit:.2f}")
+    print(f"长期总利润: {long_term_profit:.2f}")
+    print(f"总利润: {total_profit:.2f}")